@@ -3,9 +3,14 @@ from flask_cors import CORS
 import psycopg2
 import psycopg2.extras
 import json
+import math
 import os
 import requests
 from anthropic import Anthropic
+from chat_sessions import ChatSessionStore
+from intent_router import IntentRouter
+from setup_postgres import (REGIONS, DEFAULT_REGION, AGGREGATE_CELL_DEGREES, AGGREGATE_LAYERS, PROXIMITY_SOURCES,
+                            PROXIMITY_RADIUS_KM, PROXIMITY_RADIUS_TARGETS, wkb_to_geojson)
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
@@ -22,21 +27,135 @@ DB_PARAMS = {
     "port": "5432"
 }
 
+# Server-side chat history, so clients only send the new message each turn
+chat_sessions = ChatSessionStore(
+    max_sessions=int(os.environ.get("CHAT_MAX_SESSIONS", 500)),
+    ttl_seconds=int(os.environ.get("CHAT_SESSION_TTL_SECONDS", 3600)),
+    token_budget=int(os.environ.get("CHAT_HISTORY_TOKEN_BUDGET", 2000))
+)
+
+# Local answers for simple questions and cached first-turn model responses
+intent_router = IntentRouter(cache_size=int(os.environ.get("CHAT_RESPONSE_CACHE_SIZE", 256)))
+
+# Aggregate GeoJSON per (region, layer, resolution); the cells only change on reload
+aggregate_cache = {}
+
 def get_db_connection():
     """Create a database connection"""
     return psycopg2.connect(**DB_PARAMS)
 
+def get_region():
+    """Region requested via ?region= or the JSON body, defaulting to DEFAULT_REGION.
+
+    A non-string region (e.g. a JSON list) comes back as None, which callers
+    reject as an unknown region.
+    """
+    region = request.args.get('region')
+    if region is None and request.is_json:
+        body = request.get_json(silent=True)
+        region = body.get('region') if isinstance(body, dict) else None
+    if region is not None and not isinstance(region, str):
+        return None
+    return region or DEFAULT_REGION
+
+def get_load_version(cur, region):
+    """Current load version of a region (0 if never loaded), bumped by every reload"""
+    cur.execute("SELECT version FROM region_loads WHERE region = %s", (region,))
+    row = cur.fetchone()
+    return row['version'] if row else 0
+
+# Layers find_nearest searches from (from_feature.type) and for (infrastructure_type)
+NEAREST_LAYERS = ['airports', 'ports', 'warehouses']
+
+# Most features returned by a ?name= search
+NAME_SEARCH_LIMIT = 20
+
+def contains_pattern(text):
+    """ILIKE pattern matching text anywhere, with LIKE wildcards in text escaped"""
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+def resolve_feature(cur, region, feature):
+    """Look up a {type, id} or {type, name} feature; a name picks the largest feature whose name contains it"""
+    table = feature['type']
+    if isinstance(feature.get('id'), str):
+        cur.execute(f"""
+            SELECT id, name, centroid_lon, centroid_lat FROM {table}
+            WHERE region = %s AND id = %s AND centroid_lon IS NOT NULL
+        """, (region, feature['id']))
+    else:
+        cur.execute(f"""
+            SELECT id, name, centroid_lon, centroid_lat FROM {table}
+            WHERE region = %s AND name ILIKE %s AND centroid_lon IS NOT NULL
+            ORDER BY area_m2 DESC NULLS LAST
+            LIMIT 1
+        """, (region, contains_pattern(feature['name'])))
+    return cur.fetchone()
+
+def nearest_from_edges(cur, region, from_table, from_id, table):
+    """Nearest feature of a table to a facility, read from facility_proximity.
+
+    Works both ways: from a warehouse to its ports and airports, and from a
+    port or airport back to the warehouses that have it as a neighbour.
+    Returns None when the stored edges can't prove the answer: only a
+    warehouse's rank-1 edge, or any edge within PROXIMITY_RADIUS_KM of a
+    radius target (all such pairs are stored), is certain to be the nearest.
+    """
+    forward = from_table in PROXIMITY_SOURCES
+    if forward:
+        join_id = "p.target_id"
+        where = "p.source_table = %s AND p.source_id = %s AND p.target_table = %s"
+        radius_table = table
+    else:
+        join_id = "p.source_id"
+        where = "p.target_table = %s AND p.target_id = %s AND p.source_table = %s"
+        radius_table = from_table
+
+    cur.execute(f"""
+        SELECT t.id, t.name, t.subtype, t.class, t.centroid_lon AS lon, t.centroid_lat AS lat,
+               p.rank, p.distance_km
+        FROM facility_proximity p
+        JOIN {table} t ON t.region = p.region AND t.id = {join_id}
+        WHERE p.region = %s AND {where}
+        ORDER BY p.distance_km
+        LIMIT 1
+    """, (region, from_table, from_id, table))
+    row = cur.fetchone()
+
+    if row and ((forward and row['rank'] == 1) or
+                (radius_table in PROXIMITY_RADIUS_TARGETS and row['distance_km'] <= PROXIMITY_RADIUS_KM)):
+        return row
+    return None
+
+def get_bbox():
+    """Optional ?bbox=min_lon,min_lat,max_lon,max_lat viewport filter, None when absent.
+
+    Raises ValueError if the parameter is present but malformed.
+    """
+    bbox = request.args.get('bbox')
+    if bbox is None:
+        return None
+    values = [float(v) for v in bbox.split(',')]
+    if len(values) != 4 or values[0] > values[2] or values[1] > values[3]:
+        raise ValueError("bbox must be min_lon,min_lat,max_lon,max_lat")
+    return values
+
 @app.route('/api/airports', methods=['GET'])
 def get_airports():
-    """Get all airports as GeoJSON"""
+    """Get all airports in a region as GeoJSON"""
     try:
+        region = get_region()
+        if region not in REGIONS:
+            return jsonify({"error": "Unknown region"}), 400
+
         conn = get_db_connection()
         cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
         cur.execute("""
             SELECT id, name, subtype, class, geometry
             FROM airports
-        """)
+            WHERE region = %s
+        """, (region,))
 
         rows = cur.fetchall()
 
@@ -51,7 +170,7 @@ def get_airports():
                     "subtype": row['subtype'],
                     "class": row['class']
                 },
-                "geometry": row['geometry']  # Already in JSON format
+                "geometry": wkb_to_geojson(row['geometry'])  # Stored as WKB
             })
 
         geojson = {
@@ -69,15 +188,20 @@ def get_airports():
 
 @app.route('/api/ports', methods=['GET'])
 def get_ports():
-    """Get all ports as GeoJSON"""
+    """Get all ports in a region as GeoJSON"""
     try:
+        region = get_region()
+        if region not in REGIONS:
+            return jsonify({"error": "Unknown region"}), 400
+
         conn = get_db_connection()
         cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
         cur.execute("""
             SELECT id, name, subtype, class, geometry
             FROM ports
-        """)
+            WHERE region = %s
+        """, (region,))
 
         rows = cur.fetchall()
 
@@ -92,7 +216,7 @@ def get_ports():
                     "subtype": row['subtype'],
                     "class": row['class']
                 },
-                "geometry": row['geometry']  # Already in JSON format
+                "geometry": wkb_to_geojson(row['geometry'])  # Stored as WKB
             })
 
         geojson = {
@@ -110,15 +234,43 @@ def get_ports():
 
 @app.route('/api/warehouses', methods=['GET'])
 def get_warehouses():
-    """Get all warehouses as GeoJSON"""
+    """Get warehouses in a region as GeoJSON.
+
+    ?bbox= keeps only those intersecting the viewport, and ?name= searches by
+    name (largest first, at most NAME_SEARCH_LIMIT) wherever they are.
+    """
     try:
+        region = get_region()
+        if region not in REGIONS:
+            return jsonify({"error": "Unknown region"}), 400
+        try:
+            bbox = get_bbox()
+        except ValueError:
+            return jsonify({"error": "bbox must be min_lon,min_lat,max_lon,max_lat"}), 400
+        name = request.args.get('name')
+
         conn = get_db_connection()
         cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
-        cur.execute("""
+        conditions = ["region = %s"]
+        params = [region]
+        if bbox:
+            # Feature bbox overlaps the viewport
+            min_lon, min_lat, max_lon, max_lat = bbox
+            conditions.append("max_lon >= %s AND min_lon <= %s AND max_lat >= %s AND min_lat <= %s")
+            params.extend([min_lon, max_lon, min_lat, max_lat])
+        suffix = ""
+        if name:
+            conditions.append("name ILIKE %s")
+            params.append(contains_pattern(name))
+            suffix = f"ORDER BY area_m2 DESC NULLS LAST LIMIT {NAME_SEARCH_LIMIT}"
+
+        cur.execute(f"""
             SELECT id, name, subtype, class, height, num_floors, geometry
             FROM warehouses
-        """)
+            WHERE {' AND '.join(conditions)}
+            {suffix}
+        """, params)
 
         rows = cur.fetchall()
 
@@ -135,17 +287,113 @@ def get_warehouses():
                     "height": row['height'],
                     "num_floors": row['num_floors']
                 },
-                "geometry": row['geometry']
+                "geometry": wkb_to_geojson(row['geometry'])  # Stored as WKB
+            })
+
+        geojson = {
+            "type": "FeatureCollection",
+            "features": features
+        }
+
+        cur.close()
+        conn.close()
+
+        return jsonify(geojson)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def reply_history_text(response_data):
+    """Text recorded in chat history for a reply; tool-only replies are recorded as the tools used"""
+    return response_data["text"] or "[Used tools: {}]".format(
+        ", ".join(action["tool"] for action in response_data["actions"])
+    )
+
+def zoom_to_resolution(zoom):
+    """Pick an aggregate grid resolution for a map zoom level"""
+    return max(0, min(len(AGGREGATE_CELL_DEGREES) - 1, int(zoom) - 8))
+
+@app.route('/api/aggregate/<layer>', methods=['GET'])
+def get_aggregate(layer):
+    """Get a layer binned into square grid cells as GeoJSON, for low-zoom views"""
+    try:
+        if layer not in AGGREGATE_LAYERS:
+            return jsonify({"error": "Invalid infrastructure type"}), 400
+
+        region = get_region()
+        if region not in REGIONS:
+            return jsonify({"error": "Unknown region"}), 400
+
+        resolution = request.args.get('resolution', type=int)
+        if resolution is None:
+            zoom = request.args.get('zoom', 10, type=float)
+            if not math.isfinite(zoom):
+                return jsonify({"error": "Invalid zoom"}), 400
+            resolution = zoom_to_resolution(zoom)
+        if not 0 <= resolution < len(AGGREGATE_CELL_DEGREES):
+            return jsonify({"error": "Invalid resolution"}), 400
+
+        conn = get_db_connection()
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+        # Keyed by load version, so a reload of the region is never served stale cells
+        cache_key = (region, layer, resolution, get_load_version(cur, region))
+        if cache_key in aggregate_cache:
+            cur.close()
+            conn.close()
+            return jsonify(aggregate_cache[cache_key])
+
+        cur.execute("""
+            SELECT cell_x, cell_y, count, sum_height, height_count, sum_floors, floors_count
+            FROM layer_aggregates
+            WHERE region = %s AND layer = %s AND resolution = %s
+        """, (region, layer, resolution))
+
+        rows = cur.fetchall()
+
+        cell_deg = AGGREGATE_CELL_DEGREES[resolution]
+        features = []
+        for row in rows:
+            west = row['cell_x'] * cell_deg
+            south = row['cell_y'] * cell_deg
+            properties = {"count": row['count']}
+            if AGGREGATE_LAYERS[layer]:
+                properties.update({
+                    "sum_height": row['sum_height'],
+                    "avg_height": row['sum_height'] / row['height_count'] if row['height_count'] else None,
+                    "sum_floors": row['sum_floors'],
+                    "avg_floors": row['sum_floors'] / row['floors_count'] if row['floors_count'] else None
+                })
+            features.append({
+                "type": "Feature",
+                "properties": properties,
+                "geometry": {
+                    "type": "Polygon",
+                    "coordinates": [[
+                        [round(west, 6), round(south, 6)],
+                        [round(west + cell_deg, 6), round(south, 6)],
+                        [round(west + cell_deg, 6), round(south + cell_deg, 6)],
+                        [round(west, 6), round(south + cell_deg, 6)],
+                        [round(west, 6), round(south, 6)]
+                    ]]
+                }
             })
 
         geojson = {
             "type": "FeatureCollection",
+            "resolution": resolution,
+            "cell_degrees": cell_deg,
             "features": features
         }
 
         cur.close()
         conn.close()
 
+        # Drop this region's cells from older loads
+        for key in list(aggregate_cache):
+            if key[0] == region and key[3] != cache_key[3]:
+                aggregate_cache.pop(key, None)
+        aggregate_cache[cache_key] = geojson
         return jsonify(geojson)
 
     except Exception as e:
@@ -157,28 +405,58 @@ def chat():
     try:
         data = request.json
         user_message = data.get('message', '')
-        conversation_history = data.get('history', [])
 
         if not user_message:
             return jsonify({"error": "No message provided"}), 400
 
+        # Validate before creating a session, so bad requests don't open one
+        region = get_region()
+        region_config = REGIONS.get(region)
+        if not region_config:
+            return jsonify({"error": "Unknown region"}), 400
+
+        # 'history' is only used to seed a session for clients that still send it
+        session_id = chat_sessions.ensure(data.get('session_id'), seed_history=data.get('history'))
+        history_summary, conversation_history = chat_sessions.context(session_id)
+
         # Get current infrastructure stats for context
         conn = get_db_connection()
         cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
         # Quick stats query
-        cur.execute("SELECT COUNT(*) as count FROM airports")
+        cur.execute("SELECT COUNT(*) as count FROM airports WHERE region = %s", (region,))
         airport_count = cur.fetchone()['count']
 
-        cur.execute("SELECT COUNT(*) as count FROM ports")
+        cur.execute("SELECT COUNT(*) as count FROM ports WHERE region = %s", (region,))
         port_count = cur.fetchone()['count']
 
-        cur.execute("SELECT COUNT(*) as count FROM warehouses")
+        cur.execute("SELECT COUNT(*) as count FROM warehouses WHERE region = %s", (region,))
         warehouse_count = cur.fetchone()['count']
 
+        load_version = get_load_version(cur, region)
+
         cur.close()
         conn.close()
 
+        # Answer simple questions locally, then try the response cache before calling the model.
+        # Cached model answers are only reused on a fresh conversation, where no history can change them.
+        counts = {'airports': airport_count, 'ports': port_count, 'warehouses': warehouse_count}
+        fresh_conversation = not conversation_history and not history_summary
+        # Keyed by load version, so any reload of the region invalidates cached answers
+        cache_key = intent_router.cache_key(region, user_message, load_version)
+
+        local_response = intent_router.route(user_message, region_config, counts)
+        outcome = 'routed'
+        if local_response is None and fresh_conversation:
+            local_response = intent_router.get_cached(cache_key)
+            outcome = 'cache_hits'
+
+        if local_response is not None:
+            intent_router.record(outcome)
+            chat_sessions.append_turn(session_id, user_message, reply_history_text(local_response))
+            local_response["session_id"] = session_id
+            return jsonify(local_response)
+
         # Define tools that Claude can use
         tools = [
             {
@@ -264,7 +542,7 @@ def chat():
             },
             {
                 "name": "find_nearest",
-                "description": "Finds the nearest infrastructure feature of a specific type to a given location. Use this when the user asks for the closest/nearest airport, port, or warehouse to a location.",
+                "description": "Finds the nearest infrastructure feature of a specific type to a given location or to a named facility. Use this when the user asks for the closest/nearest airport, port, or warehouse to a location or facility.",
                 "input_schema": {
                     "type": "object",
                     "properties": {
@@ -277,19 +555,34 @@ def chat():
                             "required": ["lat", "lon"],
                             "description": "Location to search from"
                         },
+                        "from_feature": {
+                            "type": "object",
+                            "properties": {
+                                "type": {"type": "string", "enum": NEAREST_LAYERS, "description": "Layer the facility belongs to"},
+                                "name": {"type": "string", "description": "Name (or part of it) of the facility to search from"},
+                                "id": {"type": "string", "description": "ID of the facility, if known, instead of name"}
+                            },
+                            "required": ["type"],
+                            "description": "Facility to search from instead of a location, e.g. a port to find the warehouses that depend on it; answered from precomputed proximity edges where possible"
+                        },
                         "infrastructure_type": {
                             "type": "string",
                             "enum": ["airports", "ports", "warehouses"],
                             "description": "Type of infrastructure to search for"
                         }
                     },
-                    "required": ["location", "infrastructure_type"]
+                    "required": ["infrastructure_type"]
                 }
             }
         ]
 
         # System prompt with context
-        system_prompt = f"""You are an AI assistant helping users explore infrastructure data for the Los Angeles area in a 3D visualization application.
+        xmin, ymin, xmax, ymax = region_config['bbox']
+        landmarks = "\n".join(
+            f"- {name}: ~{lat:.4f}°{'N' if lat >= 0 else 'S'}, {abs(lon):.4f}°{'E' if lon >= 0 else 'W'}"
+            for name, lat, lon in region_config['landmarks']
+        )
+        system_prompt = f"""You are an AI assistant helping users explore infrastructure data for the {region_config['name']} area in a 3D visualization application.
 
 Current data overview:
 - Airports: {airport_count} features (including airports, helipads, terminals)
@@ -313,7 +606,9 @@ Examples of what you CAN do:
 - "Take me to LAX" → Use fly_to_location tool
 - "Show only airports" → Use filter_infrastructure tool
 - "Route from LAX to Long Beach Port" → Use calculate_route tool
-- "What's the closest warehouse to LAX?" → Use find_nearest tool
+- "What's the closest warehouse to LAX?" → Use find_nearest with from_feature {{"type": "airports", "name": "Los Angeles International"}} and infrastructure_type "warehouses"
+- "Which warehouse depends most on the Port of Long Beach?" → Use find_nearest with from_feature {{"type": "ports", "name": "Long Beach"}} and infrastructure_type "warehouses"
+- "Which port is nearest to 34.05, -118.24?" → Use find_nearest with location {{"lat": 34.05, "lon": -118.24}}
 
 Examples of what you CANNOT do (respond with "not yet implemented"):
 - Editing data, adding new infrastructure, deleting features
@@ -325,12 +620,10 @@ Examples of what you CANNOT do (respond with "not yet implemented"):
 
 Be concise and helpful. If unsure, it's better to say "not yet implemented" than to give incorrect information.
 
-The map covers the greater Los Angeles area (approximately -118.7 to -118.15 longitude, 33.7 to 34.35 latitude).
+The map covers the greater {region_config['name']} area (approximately {xmin} to {xmax} longitude, {ymin} to {ymax} latitude).
 
 Notable locations:
-- LAX (Los Angeles International Airport): ~33.9416°N, 118.4085°W
-- Long Beach Port: ~33.7545°N, 118.1933°W
-- Downtown LA: ~34.0522°N, 118.2437°W"""
+{landmarks}"""
 
         # Build messages for Claude
         messages = []
@@ -348,6 +641,14 @@ Notable locations:
             "content": user_message
         })
 
+        # Excerpts of compacted turns contain user text, so they lead the first user turn
+        # (keeping roles alternating) rather than going into the system prompt
+        if history_summary:
+            messages[0]["content"] = [
+                {"type": "text", "text": f"Earlier conversation (older turns, truncated excerpts):\n{history_summary}"},
+                {"type": "text", "text": messages[0]["content"]}
+            ]
+
         # Call Claude API
         # Using Claude 3 Haiku for cost-effective responses
         response = anthropic_client.messages.create(
@@ -357,12 +658,14 @@ Notable locations:
             tools=tools,
             messages=messages
         )
+        intent_router.record('model_calls')
 
         # Process response
         response_data = {
             "text": "",
             "actions": [],
-            "tool_calls": []
+            "tool_calls": [],
+            "session_id": session_id
         }
 
         for block in response.content:
@@ -382,16 +685,31 @@ Notable locations:
             # The frontend will execute them and optionally send results back
             response_data["needs_tool_execution"] = True
 
+        if fresh_conversation:
+            intent_router.store(cache_key, {k: v for k, v in response_data.items() if k != "session_id"})
+
+        # Remember this exchange
+        chat_sessions.append_turn(session_id, user_message, reply_history_text(response_data))
+
         return jsonify(response_data)
 
     except Exception as e:
         print(f"Chat error: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/chat/stats', methods=['GET'])
+def get_chat_stats():
+    """Get how many chat requests were answered locally, from cache, or by the model"""
+    return jsonify(intent_router.snapshot())
+
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
-    """Get infrastructure statistics"""
+    """Get infrastructure statistics for a region"""
     try:
+        region = get_region()
+        if region not in REGIONS:
+            return jsonify({"error": "Unknown region"}), 400
+
         conn = get_db_connection()
         cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
@@ -406,11 +724,12 @@ def get_stats():
                 class,
                 COUNT(*) as count
             FROM airports
+            WHERE region = %s
             GROUP BY class
             ORDER BY count DESC
-        """)
+        """, (region,))
         airport_details = cur.fetchall()
-        cur.execute("SELECT COUNT(*) as total FROM airports")
+        cur.execute("SELECT COUNT(*) as total FROM airports WHERE region = %s", (region,))
         stats['airports'] = {
             'total': cur.fetchone()['total'],
             'by_class': [dict(row) for row in airport_details]
@@ -423,11 +742,12 @@ def get_stats():
                 subtype,
                 COUNT(*) as count
             FROM ports
+            WHERE region = %s
             GROUP BY subtype
             ORDER BY count DESC
-        """)
+        """, (region,))
         port_details = cur.fetchall()
-        cur.execute("SELECT COUNT(*) as total FROM ports")
+        cur.execute("SELECT COUNT(*) as total FROM ports WHERE region = %s", (region,))
         stats['ports'] = {
             'total': cur.fetchone()['total'],
             'by_subtype': [dict(row) for row in port_details]
@@ -440,9 +760,11 @@ def get_stats():
                 AVG(height) as avg_height,
                 AVG(num_floors) as avg_floors
             FROM warehouses
-        """)
+            WHERE region = %s
+        """, (region,))
         warehouse_stats = cur.fetchone()
         stats['warehouses'] = dict(warehouse_stats)
+        stats['region'] = region
 
         cur.close()
         conn.close()
@@ -529,9 +851,19 @@ def find_nearest():
         data = request.json
         location = data.get('location')  # {lat, lon}
         infrastructure_type = data.get('infrastructure_type')  # 'airports', 'ports', or 'warehouses'
+        from_feature = data.get('from_feature')  # optional {type, id} or {type, name} of a loaded facility
 
-        if not location or not infrastructure_type:
-            return jsonify({"error": "Location and infrastructure_type required"}), 400
+        if (not location and not from_feature) or not infrastructure_type:
+            return jsonify({"error": "Location (or from_feature) and infrastructure_type required"}), 400
+
+        if from_feature is not None and not (
+            isinstance(from_feature, dict) and
+            from_feature.get('type') in NEAREST_LAYERS and
+            (isinstance(from_feature.get('id'), str) or isinstance(from_feature.get('name'), str))
+        ):
+            return jsonify({
+                "error": f"from_feature must be {{type, id}} or {{type, name}} with type in {NEAREST_LAYERS}"
+            }), 400
 
         # Map infrastructure type to table name
         table_map = {
@@ -544,12 +876,30 @@ def find_nearest():
         if not table:
             return jsonify({"error": "Invalid infrastructure type"}), 400
 
+        region = get_region()
+        if region not in REGIONS:
+            return jsonify({"error": "Unknown region"}), 400
+
         conn = get_db_connection()
         cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
+        # Searching from a known facility: answer from the precomputed proximity
+        # edges when they are conclusive, otherwise scan from its centroid
+        exclude_id = None
+        result = None
+        if from_feature:
+            origin = resolve_feature(cur, region, from_feature)
+            if not origin:
+                cur.close()
+                conn.close()
+                return jsonify({"error": "from_feature not found"}), 404
+            result = nearest_from_edges(cur, region, from_feature['type'], origin['id'], table)
+            location = {'lat': origin['centroid_lat'], 'lon': origin['centroid_lon']}
+            if from_feature['type'] == table:
+                exclude_id = origin['id']
+
         # Calculate distance using haversine formula approximation
-        # Extract coordinates from geometry and calculate distance
-        # Geometry structure: {coordinates: [[[lon, lat], [lon, lat], ...]]} for polygons
+        # from the centroid columns precomputed at load time
         query = f"""
             WITH coords AS (
                 SELECT
@@ -557,20 +907,16 @@ def find_nearest():
                     name,
                     subtype,
                     class,
-                    geometry,
-                    -- Extract first coordinate from the polygon
-                    -- Structure: coordinates[0][0][0][0] = lon, coordinates[0][0][0][1] = lat
-                    CAST((geometry->'coordinates'->0->0->0->>0) AS FLOAT) as lon,
-                    CAST((geometry->'coordinates'->0->0->0->>1) AS FLOAT) as lat
+                    centroid_lon as lon,
+                    centroid_lat as lat
                 FROM {table}
-                WHERE geometry->'coordinates'->0->0->0 IS NOT NULL
+                WHERE region = %s AND id IS DISTINCT FROM %s
             )
             SELECT
                 id,
                 name,
                 subtype,
                 class,
-                geometry,
                 lat,
                 lon,
                 -- Haversine distance approximation in km
@@ -587,8 +933,9 @@ def find_nearest():
             LIMIT 1
         """
 
-        cur.execute(query, (location['lat'], location['lon'], location['lat']))
-        result = cur.fetchone()
+        if result is None:
+            cur.execute(query, (region, exclude_id, location['lat'], location['lon'], location['lat']))
+            result = cur.fetchone()
 
         cur.close()
         conn.close()
@@ -616,6 +963,87 @@ def find_nearest():
         print(f"Find nearest error: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/proximity/<layer>/<feature_id>', methods=['GET'])
+def get_proximity(layer, feature_id):
+    """Get precomputed proximity edges for a facility.
+
+    'nearest' lists the facilities this one is close to (e.g. a warehouse's
+    nearest ports), 'dependents' lists the facilities that have this one as a
+    neighbour (e.g. which warehouses depend on a port).
+    """
+    try:
+        valid_layers = ['airports', 'ports', 'warehouses', 'transportation_buildings']
+        if layer not in valid_layers:
+            return jsonify({"error": "Invalid infrastructure type"}), 400
+
+        region = get_region()
+        if region not in REGIONS:
+            return jsonify({"error": "Unknown region"}), 400
+
+        conn = get_db_connection()
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+        cur.execute("""
+            SELECT target_table AS layer, target_id AS id, rank, distance_km
+            FROM facility_proximity
+            WHERE region = %s AND source_table = %s AND source_id = %s
+            ORDER BY target_table, distance_km
+        """, (region, layer, feature_id))
+        nearest = [dict(row) for row in cur.fetchall()]
+
+        cur.execute("""
+            SELECT source_table AS layer, source_id AS id, rank, distance_km
+            FROM facility_proximity
+            WHERE region = %s AND target_table = %s AND target_id = %s
+            ORDER BY source_table, distance_km
+        """, (region, layer, feature_id))
+        dependents = [dict(row) for row in cur.fetchall()]
+
+        cur.close()
+        conn.close()
+
+        return jsonify({
+            'region': region,
+            'layer': layer,
+            'id': feature_id,
+            'nearest': nearest,
+            'dependents': dependents
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/regions', methods=['GET'])
+def get_regions():
+    """List configured regions with per-region feature counts"""
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+        counts = {region: {} for region in REGIONS}
+        for table in ['airports', 'ports', 'warehouses', 'transportation_buildings']:
+            cur.execute(f"SELECT region, COUNT(*) as count FROM {table} GROUP BY region")
+            for row in cur.fetchall():
+                if row['region'] in counts:
+                    counts[row['region']][table] = row['count']
+
+        cur.close()
+        conn.close()
+
+        return jsonify({
+            'default': DEFAULT_REGION,
+            'regions': [
+                {
+                    'id': region,
+                    'name': config['name'],
+                    'bbox': list(config['bbox']),
+                    'counts': counts[region]
+                }
+                for region, config in REGIONS.items()
+            ]
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -627,8 +1055,13 @@ if __name__ == '__main__':
     print("  - GET  /api/airports")
     print("  - GET  /api/ports")
     print("  - GET  /api/warehouses")
+    print("  - GET  /api/aggregate/<layer>")
     print("  - GET  /api/stats")
+    print("  - GET  /api/regions")
     print("  - POST /api/chat")
+    print("  - GET  /api/chat/stats")
     print("  - POST /api/route")
+    print("  - POST /api/find-nearest")
+    print("  - GET  /api/proximity/<layer>/<id>")
     print("  - GET  /api/health")
     app.run(debug=True, port=5001)
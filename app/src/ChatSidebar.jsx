@@ -6,6 +6,8 @@ function ChatSidebar({ isOpen, onToggle, onAction }) {
   const [input, setInput] = useState('');
   const [isLoading, setIsLoading] = useState(false);
   const messagesEndRef = useRef(null);
+  // Conversation history lives on the server; only the new message is sent
+  const sessionIdRef = useRef(null);
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
@@ -33,7 +35,7 @@ function ChatSidebar({ isOpen, onToggle, onAction }) {
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
           message: userMessage,
-          history: messages
+          session_id: sessionIdRef.current
         })
       });
 
@@ -42,6 +44,7 @@ function ChatSidebar({ isOpen, onToggle, onAction }) {
       }
 
       const data = await response.json();
+      sessionIdRef.current = data.session_id;
 
       // Add assistant response
       if (data.text) {
@@ -2,7 +2,7 @@ import DeckGL from '@deck.gl/react';
 import { Map } from 'react-map-gl/maplibre';
 import { GeoJsonLayer, PathLayer } from '@deck.gl/layers';
 import { useState, useEffect, useRef, useCallback } from 'react';
-import { FlyToInterpolator } from '@deck.gl/core';
+import { FlyToInterpolator, WebMercatorViewport } from '@deck.gl/core';
 import 'maplibre-gl/dist/maplibre-gl.css';
 import ChatSidebar from './ChatSidebar';
 
@@ -25,10 +25,30 @@ const INITIAL_VIEW_STATE = {
 
 const MAP_STYLE = 'https://basemaps.cartocdn.com/gl/dark-matter-gl-style/style.json';
 
+// Below this zoom, warehouses are shown as server-side grid aggregates
+const AGGREGATE_MAX_ZOOM = 11;
+
+// Warehouse polygons are fetched for the viewport snapped outward to this grid (degrees),
+// so small pans reuse the previous response
+const VIEWPORT_GRID_DEGREES = 0.05;
+
+function snappedViewportBbox(viewState) {
+  const viewport = new WebMercatorViewport({
+    ...viewState,
+    width: window.innerWidth,
+    height: window.innerHeight
+  });
+  const [minLon, minLat, maxLon, maxLat] = viewport.getBounds();
+  const down = v => (Math.floor(v / VIEWPORT_GRID_DEGREES) - 1) * VIEWPORT_GRID_DEGREES;
+  const up = v => (Math.ceil(v / VIEWPORT_GRID_DEGREES) + 1) * VIEWPORT_GRID_DEGREES;
+  return [down(minLon), down(minLat), up(maxLon), up(maxLat)].map(v => v.toFixed(2)).join(',');
+}
+
 function MapComponent() {
   const [airportData, setAirportData] = useState(null);
   const [portData, setPortData] = useState(null);
   const [warehouseData, setWarehouseData] = useState(null);
+  const [warehouseAggregate, setWarehouseAggregate] = useState(null);
   const [viewState, setViewState] = useState(INITIAL_VIEW_STATE);
   const [chatOpen, setChatOpen] = useState(false);
   const [visibleLayers, setVisibleLayers] = useState({
@@ -59,16 +79,42 @@ function MapComponent() {
         console.log(`Loaded ${data.features.length} port infrastructure features from PostgreSQL`);
       })
       .catch(err => console.error('Error loading port data:', err));
+  }, []);
+
+  // Load warehouse density cells for low-zoom views, once per whole zoom level
+  const zoomLevel = Math.floor(viewState.zoom);
+  const showAggregates = viewState.zoom < AGGREGATE_MAX_ZOOM;
 
-    // Load warehouses from PostgreSQL API
-    fetch('http://localhost:5001/api/warehouses')
+  // Load warehouse polygons only once zoomed in past the aggregates, limited to the viewport
+  const warehouseBbox = showAggregates ? null : snappedViewportBbox(viewState);
+
+  useEffect(() => {
+    if (!warehouseBbox) return;
+    // Ignore responses for a viewport we have already panned away from
+    let stale = false;
+    fetch(`http://localhost:5001/api/warehouses?bbox=${warehouseBbox}`)
       .then(res => res.json())
       .then(data => {
+        if (stale) return;
         setWarehouseData(data);
-        console.log(`Loaded ${data.features.length} warehouse buildings from PostgreSQL`);
+        console.log(`Loaded ${data.features.length} warehouse buildings in view from PostgreSQL`);
       })
       .catch(err => console.error('Error loading warehouse data:', err));
-  }, []);
+    return () => { stale = true; };
+  }, [warehouseBbox]);
+
+  useEffect(() => {
+    if (!showAggregates) return;
+    // Ignore responses for a zoom level we have already left
+    let stale = false;
+    fetch(`http://localhost:5001/api/aggregate/warehouses?zoom=${zoomLevel}`)
+      .then(res => res.json())
+      .then(data => {
+        if (!stale) setWarehouseAggregate(data);
+      })
+      .catch(err => console.error('Error loading warehouse aggregates:', err));
+    return () => { stale = true; };
+  }, [zoomLevel, showAggregates]);
 
   // Handle actions from Claude AI
   const handleChatAction = useCallback((action) => {
@@ -101,29 +147,42 @@ function MapComponent() {
       case 'highlight_feature':
         // Find and highlight the feature
         const { name, type } = action.input;
+        const focusFeature = feature => {
+          setHighlightedFeature(feature.properties.id);
+          // Also fly to the feature
+          const coords = feature.geometry.coordinates[0][0]; // Get first coordinate of polygon
+          setViewState({
+            longitude: coords[0],
+            latitude: coords[1],
+            zoom: 15,
+            pitch: 50,
+            bearing: 0,
+            transitionDuration: 2000,
+            transitionInterpolator: new FlyToInterpolator()
+          });
+        };
+
+        if (type === 'warehouse') {
+          // Only the viewport's warehouses are loaded, so search all of them server-side
+          fetch(`http://localhost:5001/api/warehouses?name=${encodeURIComponent(name)}`)
+            .then(res => res.json())
+            .then(data => {
+              if (data.features && data.features.length) focusFeature(data.features[0]);
+              else console.log(`No warehouse named ${name}`);
+            })
+            .catch(err => console.error('Warehouse search error:', err));
+          break;
+        }
+
         let data = null;
         if (type === 'airport') data = airportData;
         else if (type === 'port') data = portData;
-        else if (type === 'warehouse') data = warehouseData;
 
         if (data) {
           const feature = data.features.find(f =>
             f.properties.name && f.properties.name.toLowerCase().includes(name.toLowerCase())
           );
-          if (feature) {
-            setHighlightedFeature(feature.properties.id);
-            // Also fly to the feature
-            const coords = feature.geometry.coordinates[0][0]; // Get first coordinate of polygon
-            setViewState({
-              longitude: coords[0],
-              latitude: coords[1],
-              zoom: 15,
-              pitch: 50,
-              bearing: 0,
-              transitionDuration: 2000,
-              transitionInterpolator: new FlyToInterpolator()
-            });
-          }
+          if (feature) focusFeature(feature);
         }
         break;
 
@@ -169,7 +228,11 @@ function MapComponent() {
         fetch('http://localhost:5001/api/find-nearest', {
           method: 'POST',
           headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({ location: findLocation, infrastructure_type: infraType })
+          body: JSON.stringify({
+            location: findLocation,
+            infrastructure_type: infraType,
+            from_feature: action.input.from_feature
+          })
         })
           .then(res => res.json())
           .then(data => {
@@ -196,7 +259,7 @@ function MapComponent() {
       default:
         console.log('Unknown action:', action.tool);
     }
-  }, [airportData, portData, warehouseData]);
+  }, [airportData, portData]);
 
   const layers = [
     // Airport infrastructure layer
@@ -272,7 +335,7 @@ function MapComponent() {
     }),
 
     // Warehouse buildings layer
-    warehouseData && visibleLayers.warehouses && new GeoJsonLayer({
+    warehouseData && visibleLayers.warehouses && !showAggregates && new GeoJsonLayer({
       id: 'warehouses',
       data: warehouseData,
       filled: true,
@@ -308,6 +371,20 @@ function MapComponent() {
       highlightColor: [255, 200, 0, 200]
     }),
 
+    // Warehouse density layer (low zoom)
+    warehouseAggregate && visibleLayers.warehouses && showAggregates && new GeoJsonLayer({
+      id: 'warehouse-aggregates',
+      data: warehouseAggregate,
+      filled: true,
+      extruded: true,
+      wireframe: false,
+      getElevation: f => f.properties.count * 20,
+      getFillColor: [140, 120, 90, 160], // Brown/tan, matching warehouses
+      getLineColor: [100, 85, 65],
+      lineWidthMinPixels: 1,
+      pickable: true
+    }),
+
     // Route visualization layer
     routeData && new PathLayer({
       id: 'route-layer',
@@ -334,7 +411,16 @@ function MapComponent() {
         style={{ width: '100vw', height: '100vh' }}
         layers={layers}
         getTooltip={({ object }) =>
-          object && object.properties && {
+          object && object.properties && object.properties.count !== undefined ? {
+            html: `<div style="background: rgba(0,0,0,0.8); padding: 8px 12px; border-radius: 4px;">
+                    <strong>${object.properties.count} warehouses</strong>
+                    ${object.properties.avg_height ? `<br/>Avg height: ${object.properties.avg_height.toFixed(1)} m` : ''}
+                  </div>`,
+            style: {
+              fontSize: '0.8em',
+              color: 'white'
+            }
+          } : object && object.properties && {
             html: `<div style="background: rgba(0,0,0,0.8); padding: 8px 12px; border-radius: 4px;">
                     <strong>${object.properties.name || 'Unnamed'}</strong><br/>
                     ${object.properties.subtype ? `Type: ${object.properties.subtype}` : ''}
@@ -0,0 +1,127 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# Characters per token, a rough but stable estimate for English chat text
+CHARS_PER_TOKEN = 4
+
+# Longest excerpt of each turn kept in the summary of compacted history
+SUMMARY_EXCERPT_CHARS = 200
+
+# The summary always has room for at least this many excerpts; smaller budgets get shorter ones
+SUMMARY_MIN_LINES = 4
+
+# Smallest summary share in tokens, so tiny budgets still keep some compacted history
+SUMMARY_MIN_TOKENS = 40
+
+# Characters a summary line adds around its excerpt: "- Assistant: " and a trailing "..."
+SUMMARY_LINE_OVERHEAD = len("- Assistant: ...")
+
+def estimate_tokens(text):
+    """Approximate the token count of a string"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+class ChatSessionStore:
+    """In-memory chat sessions keyed by session id.
+
+    Sessions are evicted when idle for longer than ttl_seconds or, least
+    recently used first, when more than max_sessions are open. Once a
+    session's history exceeds token_budget, its oldest turns are replaced by
+    truncated excerpts of each turn (not a generated summary), so the client
+    only ever sends the new message.
+    """
+
+    def __init__(self, max_sessions=500, ttl_seconds=3600, token_budget=2000):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.token_budget = token_budget
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _evict(self, now):
+        while self.sessions:
+            session_id, session = next(iter(self.sessions.items()))
+            if len(self.sessions) > self.max_sessions or now - session['last_used'] > self.ttl_seconds:
+                del self.sessions[session_id]
+            else:
+                break
+
+    def ensure(self, session_id=None, seed_history=None):
+        """Return a live session id, creating the session if needed.
+
+        Unknown or expired ids are never adopted: a new session gets a freshly
+        generated id, which the caller must hand back to the client.
+        seed_history lets older clients that still send a full history start a
+        session from it; entries that aren't {role, content} text turns are skipped.
+        """
+        now = time.time()
+        with self.lock:
+            self._evict(now)
+
+            if session_id not in self.sessions:
+                session_id = uuid.uuid4().hex
+                self.sessions[session_id] = {'summary': [], 'messages': [], 'last_used': now}
+                for msg in seed_history if isinstance(seed_history, list) else []:
+                    if (not isinstance(msg, dict) or msg.get('role') not in ('user', 'assistant')
+                            or not isinstance(msg.get('content'), str)):
+                        continue
+                    self.sessions[session_id]['messages'].append({
+                        'role': msg['role'],
+                        'content': msg['content']
+                    })
+                self._compact(self.sessions[session_id])
+
+            self.sessions[session_id]['last_used'] = now
+            self.sessions.move_to_end(session_id)
+            self._evict(now)
+        return session_id
+
+    def context(self, session_id):
+        """Return (summary, messages) for a session: compacted history text and recent turns"""
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if not session:
+                return '', []
+            return '\n'.join(session['summary']), [dict(msg) for msg in session['messages']]
+
+    def append_turn(self, session_id, user_message, assistant_message):
+        """Record a completed user/assistant exchange and compact if over budget"""
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if not session:
+                return
+            session['messages'].append({'role': 'user', 'content': user_message})
+            session['messages'].append({'role': 'assistant', 'content': assistant_message})
+            self._compact(session)
+
+    def _compact(self, session):
+        """Truncate old turns into one-line excerpts until the session fits token_budget"""
+        messages = session['messages']
+        summary = session['summary']
+
+        # A quarter of the budget (at least SUMMARY_MIN_TOKENS) goes to the excerpts, the rest to verbatim turns
+        summary_budget = max(self.token_budget // 4, SUMMARY_MIN_TOKENS)
+        messages_budget = max(self.token_budget - summary_budget, 0)
+
+        # Shorten excerpts so at least SUMMARY_MIN_LINES of them fit in the summary budget
+        line_tokens = summary_budget // SUMMARY_MIN_LINES
+        excerpt_chars = min(SUMMARY_EXCERPT_CHARS, (line_tokens - 1) * CHARS_PER_TOKEN - SUMMARY_LINE_OVERHEAD)
+
+        def fold(msg):
+            excerpt = msg['content'][:excerpt_chars]
+            if len(msg['content']) > excerpt_chars:
+                excerpt += '...'
+            summary.append(f"- {msg['role'].capitalize()}: {excerpt}")
+
+        # Fold the oldest turns into the summary, always keeping the latest exchange verbatim
+        while sum(estimate_tokens(msg['content']) for msg in messages) > messages_budget and len(messages) > 2:
+            fold(messages.pop(0))
+
+        # The model expects history to start with a user turn
+        while messages and messages[0]['role'] != 'user':
+            fold(messages.pop(0))
+
+        # Drop the oldest summary lines once the summary outgrows its share
+        while summary and sum(estimate_tokens(line) for line in summary) > summary_budget:
+            summary.pop(0)
@@ -0,0 +1,225 @@
+import argparse
+import io
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+import pyarrow.dataset as ds
+
+from setup_postgres import (DB_PARAMS, REGIONS, DEFAULT_REGION, GEOMETRY_METRIC_COLUMNS, setup_database,
+                            create_region_partitions, truncate_region, build_proximity_graph, build_aggregates,
+                            mark_region_loaded, wkb_metrics)
+
+BATCH_SIZE = 10000
+
+# Layer definitions mirroring the filters in the fetch_*.sql scripts.
+# Paths are relative to the local Overture release directory.
+PARQUET_LAYERS = [
+    {
+        "table": "airports",
+        "path": "theme=base/type=infrastructure",
+        "filter": ds.field("subtype") == "airport",
+        "has_building_attrs": False
+    },
+    {
+        "table": "ports",
+        "path": "theme=base/type=infrastructure",
+        "filter": ds.field("subtype").isin(["pier", "quay"]),
+        "has_building_attrs": False
+    },
+    {
+        "table": "warehouses",
+        "path": "theme=buildings/type=building",
+        "filter": ds.field("class") == "warehouse",
+        "has_building_attrs": True
+    },
+    {
+        "table": "transportation_buildings",
+        "path": "theme=buildings/type=building",
+        "filter": (ds.field("subtype") == "transportation") |
+                  ds.field("class").isin(["train_station", "parking", "hangar", "transportation"]),
+        "has_building_attrs": True
+    }
+]
+
+# PGCOPY binary format framing
+COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+COPY_TRAILER = struct.pack("!h", -1)
+COPY_NULL = struct.pack("!i", -1)
+
+# Precompiled length-prefixed encoders for fixed-size COPY fields
+FIXED_COPY_FIELDS = {
+    "float8": struct.Struct("!id"),
+    "float4": struct.Struct("!if"),
+    "int4": struct.Struct("!ii")
+}
+LENGTH_PREFIX = struct.Struct("!i")
+
+# Metric columns derived from the WKB itself; the bbox ones come from Overture's bbox struct
+WKB_METRIC_COLUMNS = ["centroid_lon", "centroid_lat", "area_m2", "vertex_count"]
+
+def bbox_filter(bbox):
+    """Arrow expression equivalent to the bbox WHERE clause in the SQL scripts (xmin/ymin inside bbox)"""
+    xmin, ymin, xmax, ymax = bbox
+    return ((ds.field("bbox", "xmin") >= xmin) & (ds.field("bbox", "xmin") <= xmax) &
+            (ds.field("bbox", "ymin") >= ymin) & (ds.field("bbox", "ymin") <= ymax))
+
+def layer_columns(has_building_attrs):
+    """Projected columns to read, flattening names.primary like the SQL scripts"""
+    columns = {
+        "id": ds.field("id"),
+        "name": ds.field("names", "primary"),
+        "subtype": ds.field("subtype"),
+        "class": ds.field("class")
+    }
+    if has_building_attrs:
+        columns["height"] = ds.field("height")
+        columns["num_floors"] = ds.field("num_floors")
+    columns["geometry"] = ds.field("geometry")
+    columns["min_lon"] = ds.field("bbox", "xmin")
+    columns["min_lat"] = ds.field("bbox", "ymin")
+    columns["max_lon"] = ds.field("bbox", "xmax")
+    columns["max_lat"] = ds.field("bbox", "ymax")
+    return columns
+
+def batch_to_copy(batch, column_types, region):
+    """Convert an Arrow record batch into a binary COPY payload.
+
+    Overture geometry is already WKB and is stored as-is. Centroid, area and
+    vertex count are read straight from the WKB bytes (wkb_metrics), and the
+    bbox columns come from Overture's bbox struct, so no row is decoded into
+    GeoJSON.
+    """
+    geometries = batch.column("geometry").to_pylist()
+    metrics = [wkb_metrics(g) if g else (None,) * len(WKB_METRIC_COLUMNS) for g in geometries]
+
+    columns = []
+    for name in column_types:
+        if name == "region":
+            columns.append([region] * batch.num_rows)
+        elif name == "geometry":
+            columns.append(geometries)
+        elif name in WKB_METRIC_COLUMNS:
+            index = WKB_METRIC_COLUMNS.index(name)
+            columns.append([m[index] for m in metrics])
+        else:
+            columns.append(batch.column(name).to_pylist())
+
+    # One encoder per column, chosen once per batch rather than per value
+    encoders = []
+    for pg_type in column_types.values():
+        if pg_type in FIXED_COPY_FIELDS:
+            fixed = FIXED_COPY_FIELDS[pg_type]
+            size = fixed.size - 4
+            encoders.append(lambda value, fixed=fixed, size=size: fixed.pack(size, value))
+        elif pg_type == "bytea":
+            encoders.append(lambda value: LENGTH_PREFIX.pack(len(value)) + value)
+        else:
+            encoders.append(lambda value: LENGTH_PREFIX.pack(len(value.encode("utf-8"))) + value.encode("utf-8"))
+
+    out = bytearray(COPY_HEADER)
+    field_count = struct.pack("!h", len(encoders))
+    for row in zip(*columns):
+        out += field_count
+        for value, encode in zip(row, encoders):
+            out += COPY_NULL if value is None else encode(value)
+    out += COPY_TRAILER
+    return io.BytesIO(out)
+
+def load_parquet_partition(args):
+    """Stream one Parquet file into a table through binary COPY"""
+    parquet_file, table_name, layer_filter, has_building_attrs, region = args
+    bbox = REGIONS[region]["bbox"]
+
+    columns = layer_columns(has_building_attrs)
+    column_types = {"region": "text", "id": "text", "name": "text", "subtype": "text", "class": "text"}
+    if has_building_attrs:
+        column_types.update({"height": "float8", "num_floors": "int4"})
+    column_types["geometry"] = "bytea"
+    column_types.update({name: "float8" for name in GEOMETRY_METRIC_COLUMNS})
+    column_types.update({"area_m2": "float4", "vertex_count": "int4"})
+    column_list = ", ".join(column_types)
+
+    scanner = ds.dataset(parquet_file, format="parquet").scanner(
+        columns=columns,
+        filter=layer_filter & bbox_filter(bbox),
+        batch_size=BATCH_SIZE
+    )
+
+    conn = psycopg2.connect(**DB_PARAMS)
+    cur = conn.cursor()
+
+    # COPY can't skip duplicates, so stage rows and merge with ON CONFLICT
+    cur.execute(f"""
+        CREATE TEMP TABLE staging ON COMMIT DROP AS
+        SELECT {column_list} FROM {table_name} WITH NO DATA;
+    """)
+
+    for batch in scanner.to_batches():
+        if batch.num_rows == 0:
+            continue
+        cur.copy_expert(
+            f"COPY staging ({column_list}) FROM STDIN WITH (FORMAT binary)",
+            batch_to_copy(batch, column_types, region)
+        )
+
+    cur.execute(f"""
+        INSERT INTO {table_name} ({column_list})
+        SELECT {column_list} FROM staging
+        WHERE geometry IS NOT NULL
+        ON CONFLICT (region, id) DO NOTHING;
+    """)
+    inserted = cur.rowcount
+
+    conn.commit()
+    cur.close()
+    conn.close()
+    return inserted
+
+def load_parquet_to_postgres(data_dir, layer, region=DEFAULT_REGION, workers=None):
+    """Load one layer of a region from a local Overture release, one worker per Parquet file"""
+    table_name = layer["table"]
+    layer_path = os.path.join(data_dir, layer["path"])
+    files = ds.dataset(layer_path, format="parquet", partitioning="hive").files
+
+    print(f"\nLoading {len(files)} Parquet file(s) from {layer_path} into {table_name} ({region})...")
+
+    jobs = [(f, table_name, layer["filter"], layer["has_building_attrs"], region) for f in files]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        inserted = sum(pool.map(load_parquet_partition, jobs))
+
+    print(f"✓ Inserted {inserted} features into {table_name}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load Overture GeoParquet directly into PostgreSQL")
+    parser.add_argument("data_dir", help="Local Overture release directory (containing theme=... folders)")
+    parser.add_argument("--workers", type=int, default=None, help="Parallel partition loaders")
+    parser.add_argument("--region", choices=sorted(REGIONS),
+                        help="Reload only this region, leaving the schema and other regions untouched")
+    args = parser.parse_args()
+
+    if args.region:
+        regions = [args.region]
+    else:
+        setup_database()
+        regions = list(REGIONS)
+
+    for region in regions:
+        conn = psycopg2.connect(**DB_PARAMS)
+        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        cur = conn.cursor()
+        create_region_partitions(cur, region)
+        truncate_region(cur, region)
+        cur.close()
+        conn.close()
+
+        for layer in PARQUET_LAYERS:
+            load_parquet_to_postgres(args.data_dir, layer, region=region, workers=args.workers)
+
+        build_proximity_graph(region=region)
+        build_aggregates(region=region)
+        mark_region_loaded(region)
+
+    print("\n✓ All data loaded successfully!")
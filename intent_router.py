@@ -0,0 +1,126 @@
+import re
+import threading
+import uuid
+from collections import OrderedDict
+
+# Politeness wrappers that don't change what is being asked
+FILLER_PREFIXES = re.compile(r"^(?:(?:please|hey|hi|can you|could you|would you|i want to|i'd like to)\s+)+")
+FILLER_SUFFIXES = re.compile(r"(?:\s+(?:please|thanks|thank you))+$")
+
+COUNT_PATTERN = re.compile(
+    r"^(?:how many|number of|count of|total number of|total)\s+"
+    r"(?P<layer>airports?|ports?|warehouses?)"
+    r"(?:\s+(?:are there|do we have|are on the map|are loaded))?"
+    r"(?:\s+(?:in|on)\s+(?:the\s+)?(?:map|area|region|city))?$"
+)
+
+NAVIGATE_PATTERN = re.compile(r"^(?:take me to|fly to|go to|zoom to|navigate to|fly me to)\s+(?:the\s+)?(?P<place>.+)$")
+
+COUNT_DESCRIPTIONS = {
+    'airports': "airport infrastructure features (including airports, helipads, terminals)",
+    'ports': "port infrastructure features (quays, piers, and other port infrastructure)",
+    'warehouses': "warehouse buildings"
+}
+
+def normalize_query(text):
+    """Lowercase, strip punctuation and filler words so equivalent questions compare equal"""
+    text = text.lower().replace("’", "'")
+    text = re.sub(r"[^\w\s']", " ", text)
+    text = re.sub(r"\s+", " ", text).strip()
+    text = FILLER_PREFIXES.sub("", text)
+    text = FILLER_SUFFIXES.sub("", text)
+    return text
+
+def landmark_aliases(name):
+    """Names a landmark can be referred to by, e.g. 'LAX (Los Angeles International Airport)'"""
+    aliases = {normalize_query(name)}
+    match = re.match(r"^(?P<short>[^(]+)\((?P<long>[^)]+)\)", name)
+    if match:
+        aliases.add(normalize_query(match.group('short')))
+        aliases.add(normalize_query(match.group('long')))
+    return aliases
+
+class IntentRouter:
+    """Answers simple chat questions locally and caches model responses.
+
+    Count questions and navigation to known landmarks are answered from the
+    region config and current counts in the same text/actions shape the
+    model returns. Other first-turn questions can be served from a response
+    cache keyed by region, normalized query and the region's load version,
+    with fresh action ids on every replay. Hit counts are kept for
+    /api/chat/stats.
+    """
+
+    def __init__(self, cache_size=256):
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'routed': 0, 'cache_hits': 0, 'model_calls': 0}
+
+    def cache_key(self, region, message, data_version):
+        return (region, normalize_query(message), data_version)
+
+    def route(self, message, region_config, counts):
+        """Return a response dict for questions that need no model call, else None"""
+        query = normalize_query(message)
+
+        match = COUNT_PATTERN.match(query)
+        if match:
+            layer = match.group('layer')
+            if not layer.endswith('s'):
+                layer += 's'
+            return {
+                "text": f"There are {counts[layer]:,} {COUNT_DESCRIPTIONS[layer]} in the {region_config['name']} area.",
+                "actions": [],
+                "tool_calls": []
+            }
+
+        match = NAVIGATE_PATTERN.match(query)
+        if match:
+            place = match.group('place')
+            for name, lat, lon in region_config['landmarks']:
+                if place in landmark_aliases(name):
+                    return {
+                        "text": f"Flying to {name}.",
+                        "actions": [{
+                            "tool": "fly_to_location",
+                            "input": {"longitude": lon, "latitude": lat, "zoom": 14, "pitch": 50},
+                            "id": f"local_{uuid.uuid4().hex}"
+                        }],
+                        "tool_calls": [],
+                        "needs_tool_execution": True
+                    }
+
+        return None
+
+    def get_cached(self, key):
+        with self.lock:
+            response = self.cache.get(key)
+            if response is None:
+                return None
+            self.cache.move_to_end(key)
+        # Each replay gets its own tool_use ids, like a fresh model response would
+        replay = dict(response)
+        replay["actions"] = [dict(action, id=f"cached_{uuid.uuid4().hex}") for action in response.get("actions", [])]
+        return replay
+
+    def store(self, key, response):
+        with self.lock:
+            self.cache[key] = dict(response)
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def record(self, outcome):
+        """Count a request answered by 'routed', 'cache_hits' or 'model_calls'"""
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats[outcome] += 1
+
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['cached_responses'] = len(self.cache)
+        requests = stats['requests']
+        stats['local_hit_rate'] = (stats['routed'] + stats['cache_hits']) / requests if requests else 0.0
+        return stats
@@ -1,6 +1,14 @@
 import psycopg2
+import psycopg2.extras
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import itertools
 import json
+import math
+import operator
+import struct
+import sys
 
 # Database connection parameters
 DB_PARAMS = {
@@ -11,95 +19,263 @@ DB_PARAMS = {
     "port": "5432"
 }
 
+# Regions the infrastructure tables are partitioned by. Each region gets its own
+# partition of every table so it can be loaded, reloaded and queried on its own.
+REGIONS = {
+    'la': {
+        'name': 'Los Angeles',
+        'bbox': (-118.7, 33.7, -118.15, 34.35),  # (xmin, ymin, xmax, ymax)
+        'data_dir': 'app/public/data',
+        'file_prefix': 'la',
+        'landmarks': [
+            ('LAX (Los Angeles International Airport)', 33.9416, -118.4085),
+            ('Long Beach Port', 33.7545, -118.1933),
+            ('Downtown LA', 34.0522, -118.2437)
+        ]
+    }
+}
+DEFAULT_REGION = 'la'
+
+# Derived columns stored next to the WKB geometry, in geometry_metrics() order
+GEOMETRY_METRIC_COLUMNS = ['min_lon', 'min_lat', 'max_lon', 'max_lat',
+                           'centroid_lon', 'centroid_lat', 'area_m2', 'vertex_count']
+
+PARTITIONED_TABLES = ['airports', 'ports', 'warehouses', 'transportation_buildings', 'facility_proximity',
+                      'layer_aggregates']
+
+# Proximity graph parameters
+KM_PER_DEGREE = 111.32
+PROXIMITY_K = 3  # Nearest ports/airports kept per source facility
+PROXIMITY_RADIUS_KM = 5.0  # Every target facility within this radius is kept too
+PROXIMITY_SOURCES = ['warehouses']
+PROXIMITY_KNN_TARGETS = ['ports', 'airports']
+PROXIMITY_RADIUS_TARGETS = ['ports', 'airports', 'transportation_buildings']
+PROXIMITY_CHUNK_SIZE = 500
+
+# Grid aggregation for low-zoom views: square cell size in degrees per resolution
+AGGREGATE_CELL_DEGREES = [0.08, 0.04, 0.02, 0.01, 0.005]
+AGGREGATE_LAYERS = {
+    'airports': False,  # layer -> has height/num_floors
+    'ports': False,
+    'warehouses': True,
+    'transportation_buildings': True
+}
+
 def setup_database():
-    """Create tables for infrastructure data"""
+    """Create region-partitioned tables for infrastructure data"""
     conn = psycopg2.connect(**DB_PARAMS)
     conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
     cur = conn.cursor()
 
     print("Setting up database...")
 
-    # Create airports table with JSONB geometry
+    # Create airports table with WKB geometry and derived columns, partitioned by region
     cur.execute("""
         DROP TABLE IF EXISTS airports CASCADE;
         CREATE TABLE airports (
-            id VARCHAR(255) PRIMARY KEY,
+            region VARCHAR(32) NOT NULL,
+            id VARCHAR(255) NOT NULL,
             name VARCHAR(255),
             subtype VARCHAR(100),
             class VARCHAR(100),
-            geometry JSONB
-        );
+            geometry BYTEA,
+            min_lon DOUBLE PRECISION,
+            min_lat DOUBLE PRECISION,
+            max_lon DOUBLE PRECISION,
+            max_lat DOUBLE PRECISION,
+            centroid_lon DOUBLE PRECISION,
+            centroid_lat DOUBLE PRECISION,
+            area_m2 REAL,
+            vertex_count INTEGER,
+            PRIMARY KEY (region, id)
+        ) PARTITION BY LIST (region);
     """)
     print("✓ Created airports table")
 
-    # Create ports table with JSONB geometry
+    # Create ports table with WKB geometry and derived columns, partitioned by region
     cur.execute("""
         DROP TABLE IF EXISTS ports CASCADE;
         CREATE TABLE ports (
-            id VARCHAR(255) PRIMARY KEY,
+            region VARCHAR(32) NOT NULL,
+            id VARCHAR(255) NOT NULL,
             name VARCHAR(255),
             subtype VARCHAR(100),
             class VARCHAR(100),
-            geometry JSONB
-        );
+            geometry BYTEA,
+            min_lon DOUBLE PRECISION,
+            min_lat DOUBLE PRECISION,
+            max_lon DOUBLE PRECISION,
+            max_lat DOUBLE PRECISION,
+            centroid_lon DOUBLE PRECISION,
+            centroid_lat DOUBLE PRECISION,
+            area_m2 REAL,
+            vertex_count INTEGER,
+            PRIMARY KEY (region, id)
+        ) PARTITION BY LIST (region);
     """)
     print("✓ Created ports table")
 
-    # Create warehouses table with JSONB geometry
+    # Create warehouses table with WKB geometry and derived columns, partitioned by region
     cur.execute("""
         DROP TABLE IF EXISTS warehouses CASCADE;
         CREATE TABLE warehouses (
-            id VARCHAR(255) PRIMARY KEY,
+            region VARCHAR(32) NOT NULL,
+            id VARCHAR(255) NOT NULL,
             name VARCHAR(255),
             subtype VARCHAR(100),
             class VARCHAR(100),
             height FLOAT,
             num_floors INTEGER,
-            geometry JSONB
-        );
+            geometry BYTEA,
+            min_lon DOUBLE PRECISION,
+            min_lat DOUBLE PRECISION,
+            max_lon DOUBLE PRECISION,
+            max_lat DOUBLE PRECISION,
+            centroid_lon DOUBLE PRECISION,
+            centroid_lat DOUBLE PRECISION,
+            area_m2 REAL,
+            vertex_count INTEGER,
+            PRIMARY KEY (region, id)
+        ) PARTITION BY LIST (region);
     """)
     print("✓ Created warehouses table")
 
-    # Create transportation_buildings table with JSONB geometry
+    # Create transportation_buildings table with WKB geometry and derived columns, partitioned by region
     cur.execute("""
         DROP TABLE IF EXISTS transportation_buildings CASCADE;
         CREATE TABLE transportation_buildings (
-            id VARCHAR(255) PRIMARY KEY,
+            region VARCHAR(32) NOT NULL,
+            id VARCHAR(255) NOT NULL,
             name VARCHAR(255),
             subtype VARCHAR(100),
             class VARCHAR(100),
             height FLOAT,
             num_floors INTEGER,
-            geometry JSONB
-        );
+            geometry BYTEA,
+            min_lon DOUBLE PRECISION,
+            min_lat DOUBLE PRECISION,
+            max_lon DOUBLE PRECISION,
+            max_lat DOUBLE PRECISION,
+            centroid_lon DOUBLE PRECISION,
+            centroid_lat DOUBLE PRECISION,
+            area_m2 REAL,
+            vertex_count INTEGER,
+            PRIMARY KEY (region, id)
+        ) PARTITION BY LIST (region);
     """)
     print("✓ Created transportation_buildings table")
 
-    # Create indices
+    # Create facility_proximity table (precomputed nearest-neighbour edges)
+    cur.execute("""
+        DROP TABLE IF EXISTS facility_proximity CASCADE;
+        CREATE TABLE facility_proximity (
+            region VARCHAR(32) NOT NULL,
+            source_table VARCHAR(32) NOT NULL,
+            source_id VARCHAR(255) NOT NULL,
+            target_table VARCHAR(32) NOT NULL,
+            target_id VARCHAR(255) NOT NULL,
+            rank SMALLINT,
+            distance_km REAL NOT NULL,
+            PRIMARY KEY (region, source_table, source_id, target_table, target_id)
+        ) PARTITION BY LIST (region);
+    """)
+    print("✓ Created facility_proximity table")
+
+    # Create layer_aggregates table (per-resolution grid cells for low-zoom views)
+    cur.execute("""
+        DROP TABLE IF EXISTS layer_aggregates CASCADE;
+        CREATE TABLE layer_aggregates (
+            region VARCHAR(32) NOT NULL,
+            layer VARCHAR(32) NOT NULL,
+            resolution SMALLINT NOT NULL,
+            cell_x INTEGER NOT NULL,
+            cell_y INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            sum_height DOUBLE PRECISION,
+            height_count INTEGER,
+            sum_floors BIGINT,
+            floors_count INTEGER,
+            PRIMARY KEY (region, layer, resolution, cell_x, cell_y)
+        ) PARTITION BY LIST (region);
+    """)
+    print("✓ Created layer_aggregates table")
+
+    # Per-region load version, kept across rebuilds so it only ever increases.
+    # The API includes it in its cache keys, so a reload invalidates cached responses.
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS region_loads (
+            region VARCHAR(32) PRIMARY KEY,
+            version INTEGER NOT NULL,
+            loaded_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """)
+    print("✓ Created region_loads table")
+
+    # Create indices (inherited by every region partition)
     cur.execute("CREATE INDEX idx_airports_subtype ON airports(subtype);")
     cur.execute("CREATE INDEX idx_airports_class ON airports(class);")
     cur.execute("CREATE INDEX idx_ports_subtype ON ports(subtype);")
     cur.execute("CREATE INDEX idx_ports_class ON ports(class);")
     cur.execute("CREATE INDEX idx_warehouses_class ON warehouses(class);")
     cur.execute("CREATE INDEX idx_transportation_buildings_class ON transportation_buildings(class);")
+    cur.execute("CREATE INDEX idx_airports_centroid ON airports(centroid_lon, centroid_lat);")
+    cur.execute("CREATE INDEX idx_ports_centroid ON ports(centroid_lon, centroid_lat);")
+    cur.execute("CREATE INDEX idx_warehouses_centroid ON warehouses(centroid_lon, centroid_lat);")
+    cur.execute("CREATE INDEX idx_warehouses_bbox ON warehouses(min_lon, max_lon, min_lat, max_lat);")
+    cur.execute("CREATE INDEX idx_transportation_buildings_centroid ON transportation_buildings(centroid_lon, centroid_lat);")
+    cur.execute("CREATE INDEX idx_facility_proximity_target ON facility_proximity(region, target_table, target_id);")
     print("✓ Created indices")
 
+    for region in REGIONS:
+        create_region_partitions(cur, region)
+
     cur.close()
     conn.close()
     print("\n✓ Database setup complete!")
 
-def load_geojson_to_postgres(geojson_file, table_name, has_building_attrs=False):
-    """Load GeoJSON data into PostgreSQL table"""
+def create_region_partitions(cur, region):
+    """Create the per-region partition of every partitioned table, if missing"""
+    for table in PARTITIONED_TABLES:
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table}_{region}
+            PARTITION OF {table} FOR VALUES IN (%s);
+        """, (region,))
+    print(f"✓ Created partitions for region '{region}'")
+
+def truncate_region(cur, region):
+    """Empty one region's partitions; other regions stay readable and writable"""
+    tables = ", ".join(f"{table}_{region}" for table in PARTITIONED_TABLES)
+    cur.execute(f"TRUNCATE {tables};")
+
+def mark_region_loaded(region):
+    """Bump a region's load version after its data changed"""
+    conn = psycopg2.connect(**DB_PARAMS)
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO region_loads (region, version) VALUES (%s, 1)
+        ON CONFLICT (region) DO UPDATE SET version = region_loads.version + 1, loaded_at = now()
+        RETURNING version;
+    """, (region,))
+    version = cur.fetchone()[0]
+    conn.commit()
+    cur.close()
+    conn.close()
+    print(f"✓ Region '{region}' is now at load version {version}")
+
+def load_geojson_to_postgres(geojson_file, table_name, has_building_attrs=False, region=DEFAULT_REGION):
+    """Load GeoJSON data into a region's partition of a PostgreSQL table"""
     conn = psycopg2.connect(**DB_PARAMS)
     cur = conn.cursor()
 
-    print(f"\nLoading {geojson_file} into {table_name}...")
+    print(f"\nLoading {geojson_file} into {table_name} ({region})...")
 
     with open(geojson_file, 'r') as f:
         data = json.load(f)
 
     features = data.get('features', [])
     inserted = 0
+    metric_columns = ", ".join(GEOMETRY_METRIC_COLUMNS)
+    metric_placeholders = ", ".join(["%s"] * len(GEOMETRY_METRIC_COLUMNS))
 
     for feature in features:
         props = feature.get('properties', {})
@@ -108,37 +284,43 @@ def load_geojson_to_postgres(geojson_file, table_name, has_building_attrs=False)
         if not geom:
             continue
 
-        # Store geometry as JSONB
-        geom_json = json.dumps(geom)
-
         try:
+            # Store geometry as WKB plus precomputed bbox/centroid/area/vertex count
+            geom_wkb = psycopg2.Binary(geojson_to_wkb(geom))
+            metrics = geometry_metrics(geom)
+
             if has_building_attrs:
                 # Buildings table with height and num_floors
                 cur.execute(f"""
-                    INSERT INTO {table_name} (id, name, subtype, class, height, num_floors, geometry)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s::jsonb)
-                    ON CONFLICT (id) DO NOTHING;
+                    INSERT INTO {table_name} (region, id, name, subtype, class, height, num_floors,
+                                              geometry, {metric_columns})
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, {metric_placeholders})
+                    ON CONFLICT (region, id) DO NOTHING;
                 """, (
+                    region,
                     props.get('id'),
                     props.get('name'),
                     props.get('subtype'),
                     props.get('class'),
                     props.get('height'),
                     props.get('num_floors'),
-                    geom_json
+                    geom_wkb,
+                    *metrics
                 ))
             else:
                 # Infrastructure table without height/num_floors
                 cur.execute(f"""
-                    INSERT INTO {table_name} (id, name, subtype, class, geometry)
-                    VALUES (%s, %s, %s, %s, %s::jsonb)
-                    ON CONFLICT (id) DO NOTHING;
+                    INSERT INTO {table_name} (region, id, name, subtype, class, geometry, {metric_columns})
+                    VALUES (%s, %s, %s, %s, %s, %s, {metric_placeholders})
+                    ON CONFLICT (region, id) DO NOTHING;
                 """, (
+                    region,
                     props.get('id'),
                     props.get('name'),
                     props.get('subtype'),
                     props.get('class'),
-                    geom_json
+                    geom_wkb,
+                    *metrics
                 ))
             inserted += 1
         except Exception as e:
@@ -151,32 +333,593 @@ def load_geojson_to_postgres(geojson_file, table_name, has_building_attrs=False)
 
     print(f"✓ Inserted {inserted} features into {table_name}")
 
-if __name__ == "__main__":
-    # Setup database
-    setup_database()
+def load_region(region):
+    """(Re)load one region from its GeoJSON exports without touching other regions"""
+    config = REGIONS[region]
+    data_dir = config['data_dir']
+    prefix = config['file_prefix']
+
+    conn = psycopg2.connect(**DB_PARAMS)
+    conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+    cur = conn.cursor()
+    create_region_partitions(cur, region)
+    truncate_region(cur, region)
+    cur.close()
+    conn.close()
 
     # Load infrastructure data (no building attributes)
-    load_geojson_to_postgres(
-        'app/public/data/la_airport_infrastructure.geojson',
-        'airports',
-        has_building_attrs=False
-    )
-    load_geojson_to_postgres(
-        'app/public/data/la_port_infrastructure.geojson',
-        'ports',
-        has_building_attrs=False
-    )
+    load_geojson_to_postgres(f'{data_dir}/{prefix}_airport_infrastructure.geojson', 'airports',
+                             has_building_attrs=False, region=region)
+    load_geojson_to_postgres(f'{data_dir}/{prefix}_port_infrastructure.geojson', 'ports',
+                             has_building_attrs=False, region=region)
 
     # Load building data (with height and num_floors)
-    load_geojson_to_postgres(
-        'app/public/data/la_warehouses.geojson',
-        'warehouses',
-        has_building_attrs=True
-    )
-    load_geojson_to_postgres(
-        'app/public/data/la_transportation_buildings.geojson',
-        'transportation_buildings',
-        has_building_attrs=True
-    )
-
-    print("\n✓ All data loaded successfully!")
+    load_geojson_to_postgres(f'{data_dir}/{prefix}_warehouses.geojson', 'warehouses',
+                             has_building_attrs=True, region=region)
+    load_geojson_to_postgres(f'{data_dir}/{prefix}_transportation_buildings.geojson', 'transportation_buildings',
+                             has_building_attrs=True, region=region)
+
+    # Precompute facility proximity edges and low-zoom aggregates
+    build_proximity_graph(region=region)
+    build_aggregates(region=region)
+    mark_region_loaded(region)
+
+def iter_vertices(geom):
+    """Yield every distinct [lon, lat, ...] vertex of a GeoJSON geometry.
+
+    The closing position of a polygon ring repeats its first vertex and is
+    skipped, so it neither biases the centroid nor counts as a vertex.
+    """
+    geom_type = geom.get('type')
+    if geom_type == 'GeometryCollection':
+        for child in geom.get('geometries', []):
+            yield from iter_vertices(child)
+        return
+
+    coords = geom.get('coordinates') or []
+    if geom_type == 'Polygon':
+        rings = coords
+    elif geom_type == 'MultiPolygon':
+        rings = [ring for polygon in coords for ring in polygon]
+    else:
+        def walk(coords):
+            if coords and isinstance(coords[0], (int, float)):
+                yield coords
+            else:
+                for child in coords:
+                    yield from walk(child)
+
+        yield from walk(coords)
+        return
+
+    for ring in rings:
+        if len(ring) > 1 and ring[0][0] == ring[-1][0] and ring[0][1] == ring[-1][1]:
+            ring = ring[:-1]
+        yield from ring
+
+def geometry_metrics(geom):
+    """Return the GEOMETRY_METRIC_COLUMNS values for a GeoJSON geometry.
+
+    Area is planar (equirectangular around the centroid latitude), which is
+    accurate to well under a percent at building and port scale.
+    """
+    positions = list(iter_vertices(geom)) if geom else []
+    if not positions:
+        return (None,) * len(GEOMETRY_METRIC_COLUMNS)
+
+    lons = [p[0] for p in positions]
+    lats = [p[1] for p in positions]
+    centroid_lon = sum(lons) / len(positions)
+    centroid_lat = sum(lats) / len(positions)
+
+    if geom['type'] == 'Polygon':
+        polygons = [geom['coordinates']]
+    elif geom['type'] == 'MultiPolygon':
+        polygons = geom['coordinates']
+    else:
+        polygons = []
+
+    m_per_lon = KM_PER_DEGREE * 1000 * math.cos(math.radians(centroid_lat))
+    m_per_lat = KM_PER_DEGREE * 1000
+
+    def ring_area(ring):
+        if not ring:
+            return 0.0
+        # Relative to the first vertex, to avoid cancellation at large lon/lat values
+        x0, y0 = ring[0][0], ring[0][1]
+        points = [(p[0] - x0, p[1] - y0) for p in ring]
+        total = 0.0
+        for (x1, y1), (x2, y2) in zip(points, points[1:] + points[:1]):
+            total += x1 * y2 - x2 * y1
+        return abs(total) / 2 * m_per_lon * m_per_lat
+
+    area = 0.0
+    for rings in polygons:
+        if rings:
+            area += ring_area(rings[0]) - sum(ring_area(hole) for hole in rings[1:])
+
+    return (min(lons), min(lats), max(lons), max(lats),
+            centroid_lon, centroid_lat, round(area, 1), len(positions))
+
+def wkb_metrics(data):
+    """Return (centroid_lon, centroid_lat, area_m2, vertex_count) straight from WKB bytes.
+
+    Matches geometry_metrics() without building GeoJSON lists: coordinates
+    are read as a memoryview of doubles and summed with C-level map/sum.
+    Only little-endian 2D WKB (what Overture ships) takes this path;
+    anything else falls back to decoding.
+    """
+    data = bytes(data)
+    if sys.byteorder != 'little' or data[0] != 1:
+        return geometry_metrics(wkb_to_geojson(data))[4:]
+
+    doubles = memoryview(data)
+    sums = [0.0, 0.0, 0]  # sum lon, sum lat, vertex count
+    ring_areas = []  # signed (outer positive, holes negative) shoelace areas in degrees^2
+
+    def read(offset):
+        (geom_type,) = struct.unpack_from('<I', data, offset + 1)
+        if data[offset] != 1 or geom_type not in (1, 2, 3, 4, 5, 6, 7):
+            raise ValueError(f"unsupported WKB type {geom_type}")
+        offset += 5
+
+        def points(offset, count, ring=False):
+            coords = doubles[offset:offset + 16 * count].cast('d')
+            xs, ys = coords[0::2], coords[1::2]
+            # Like iter_vertices, a ring's closing position isn't a vertex of its own
+            closed = ring and count > 1 and xs[0] == xs[-1] and ys[0] == ys[-1]
+            vertices = count - 1 if closed else count
+            sums[0] += sum(xs[:vertices])
+            sums[1] += sum(ys[:vertices])
+            sums[2] += vertices
+            return xs, ys, offset + 16 * count
+
+        if geom_type == 1:
+            return points(offset, 1)[2]
+        (count,) = struct.unpack_from('<I', data, offset)
+        offset += 4
+        if geom_type == 2:
+            return points(offset, count)[2]
+        if geom_type == 3:
+            for ring in range(count):
+                (n,) = struct.unpack_from('<I', data, offset)
+                xs, ys, offset = points(offset + 4, n, ring=True)
+                if n == 0:
+                    continue
+                # Relative to the first vertex, to avoid cancellation at large lon/lat values
+                xs = list(map(operator.sub, xs, itertools.repeat(xs[0])))
+                ys = list(map(operator.sub, ys, itertools.repeat(ys[0])))
+                area = abs(sum(map(operator.mul, xs, ys[1:] + ys[:1])) -
+                           sum(map(operator.mul, xs[1:] + xs[:1], ys))) / 2
+                ring_areas.append(area if ring == 0 else -area)
+            return offset
+        for _ in range(count):
+            offset = read(offset)
+        return offset
+
+    try:
+        read(0)
+    except (ValueError, TypeError, struct.error):
+        # Z/M dimensions, mixed byte order or unaligned input
+        return geometry_metrics(wkb_to_geojson(data))[4:]
+
+    sum_lon, sum_lat, count = sums
+    if count == 0:
+        return None, None, None, None
+    centroid_lon = sum_lon / count
+    centroid_lat = sum_lat / count
+    scale = KM_PER_DEGREE * 1000 * math.cos(math.radians(centroid_lat)) * KM_PER_DEGREE * 1000
+    return centroid_lon, centroid_lat, round(sum(ring_areas) * scale, 1), count
+
+def geojson_to_wkb(geom):
+    """Encode a GeoJSON geometry dict as little-endian 2D WKB"""
+    codes = {'Point': 1, 'LineString': 2, 'Polygon': 3, 'MultiPoint': 4,
+             'MultiLineString': 5, 'MultiPolygon': 6, 'GeometryCollection': 7}
+    out = bytearray()
+
+    def write_points(coords):
+        out.extend(struct.pack('<I', len(coords)))
+        for position in coords:
+            out.extend(struct.pack('<2d', position[0], position[1]))
+
+    def write(g):
+        geom_type = g['type']
+        coords = g.get('coordinates')
+        out.extend(struct.pack('<BI', 1, codes[geom_type]))
+        if geom_type == 'Point':
+            out.extend(struct.pack('<2d', coords[0], coords[1]))
+        elif geom_type == 'LineString':
+            write_points(coords)
+        elif geom_type == 'Polygon':
+            out.extend(struct.pack('<I', len(coords)))
+            for ring in coords:
+                write_points(ring)
+        elif geom_type == 'GeometryCollection':
+            out.extend(struct.pack('<I', len(g['geometries'])))
+            for child in g['geometries']:
+                write(child)
+        else:
+            out.extend(struct.pack('<I', len(coords)))
+            for part in coords:
+                write({'type': geom_type[len('Multi'):], 'coordinates': part})
+
+    write(geom)
+    return bytes(out)
+
+def wkb_to_geojson(data):
+    """Decode a (2D, Z or M) WKB geometry into a GeoJSON geometry dict"""
+    data = bytes(data)
+    names = {1: 'Point', 2: 'LineString', 3: 'Polygon', 4: 'MultiPoint',
+             5: 'MultiLineString', 6: 'MultiPolygon', 7: 'GeometryCollection'}
+
+    def read(offset):
+        order = '<' if data[offset] == 1 else '>'
+        (geom_type,) = struct.unpack_from(order + 'I', data, offset + 1)
+        offset += 5
+
+        # ISO (1000/2000/3000) and EWKB (high bit) dimension flags
+        dims = 2 + bool(geom_type & 0x80000000) + bool(geom_type & 0x40000000)
+        if geom_type & 0x20000000:
+            offset += 4  # Skip SRID
+        geom_type &= 0x0FFFFFFF
+        if geom_type > 1000:
+            dims += 1 if geom_type // 1000 in (1, 2) else 2
+            geom_type %= 1000
+
+        def points(offset, count):
+            values = struct.unpack_from(order + 'd' * (count * dims), data, offset)
+            coords = [list(values[i:i + 2]) for i in range(0, len(values), dims)]
+            return coords, offset + 8 * count * dims
+
+        def count_at(offset):
+            return struct.unpack_from(order + 'I', data, offset)[0], offset + 4
+
+        if geom_type == 1:
+            coords, offset = points(offset, 1)
+            return {'type': 'Point', 'coordinates': coords[0]}, offset
+        if geom_type == 2:
+            count, offset = count_at(offset)
+            coords, offset = points(offset, count)
+            return {'type': 'LineString', 'coordinates': coords}, offset
+        if geom_type == 3:
+            rings = []
+            ring_count, offset = count_at(offset)
+            for _ in range(ring_count):
+                count, offset = count_at(offset)
+                coords, offset = points(offset, count)
+                rings.append(coords)
+            return {'type': 'Polygon', 'coordinates': rings}, offset
+
+        count, offset = count_at(offset)
+        parts = []
+        for _ in range(count):
+            part, offset = read(offset)
+            parts.append(part)
+        if geom_type == 7:
+            return {'type': 'GeometryCollection', 'geometries': parts}, offset
+        return {'type': names[geom_type], 'coordinates': [part['coordinates'] for part in parts]}, offset
+
+    return read(0)[0]
+
+def haversine_km(lon1, lat1, lon2, lat2):
+    """Great-circle distance between two points in km"""
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = (math.sin(dlat / 2) ** 2 +
+         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2)
+    return 6371 * 2 * math.asin(min(1.0, math.sqrt(a)))
+
+class GridIndex:
+    """Uniform lon/lat grid for radius and k-nearest lookups over (id, lon, lat) points"""
+
+    def __init__(self, points, cell_km):
+        self.cell_deg = cell_km / KM_PER_DEGREE
+        self.cells = {}
+        for point in points:
+            self.cells.setdefault(self._cell(point[1], point[2]), []).append(point)
+
+        if self.cells:
+            xs = [key[0] for key in self.cells]
+            ys = [key[1] for key in self.cells]
+            self.bounds = (min(xs), min(ys), max(xs), max(ys))
+
+    def _cell(self, lon, lat):
+        return int(math.floor(lon / self.cell_deg)), int(math.floor(lat / self.cell_deg))
+
+    def _cell_km(self, lat):
+        # Smallest ground distance spanned by one cell (the lon axis near this latitude)
+        return self.cell_deg * KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01)
+
+    def within(self, lon, lat, radius_km):
+        """All (id, distance_km) pairs within radius_km"""
+        if not self.cells:
+            return []
+        cx, cy = self._cell(lon, lat)
+        span = int(math.ceil(radius_km / self._cell_km(lat)))
+        results = []
+        for x in range(cx - span, cx + span + 1):
+            for y in range(cy - span, cy + span + 1):
+                for point_id, plon, plat in self.cells.get((x, y), ()):
+                    distance = haversine_km(lon, lat, plon, plat)
+                    if distance <= radius_km:
+                        results.append((point_id, distance))
+        return results
+
+    def nearest(self, lon, lat, k):
+        """The k closest (id, distance_km) pairs, expanding rings of cells until settled"""
+        if not self.cells or k <= 0:
+            return []
+        cx, cy = self._cell(lon, lat)
+        min_x, min_y, max_x, max_y = self.bounds
+        max_ring = max(abs(cx - min_x), abs(cx - max_x), abs(cy - min_y), abs(cy - max_y))
+        cell_km = self._cell_km(lat)
+
+        candidates = []
+        for ring in range(max_ring + 1):
+            for x in range(cx - ring, cx + ring + 1):
+                for y in range(cy - ring, cy + ring + 1):
+                    if max(abs(x - cx), abs(y - cy)) != ring:
+                        continue
+                    for point_id, plon, plat in self.cells.get((x, y), ()):
+                        candidates.append((point_id, haversine_km(lon, lat, plon, plat)))
+
+            # Anything outside the rings scanned so far is at least ring * cell_km away
+            if len(candidates) >= k:
+                candidates.sort(key=lambda c: c[1])
+                candidates = candidates[:k]
+                if candidates[-1][1] <= ring * cell_km:
+                    break
+
+        candidates.sort(key=lambda c: c[1])
+        return candidates[:k]
+
+# Per-process grid indices, built once by the pool initializer
+_worker_indices = {}
+
+def _init_proximity_worker(target_points):
+    for table, points in target_points.items():
+        _worker_indices[table] = GridIndex(points, PROXIMITY_RADIUS_KM)
+
+def _proximity_edges(args):
+    """Compute proximity edges for a chunk of (id, lon, lat) source points"""
+    region, source_table, sources = args
+    edges = []
+    for source_id, lon, lat in sources:
+        # (target_table, target_id) -> [rank, distance_km]
+        found = {}
+        for table in PROXIMITY_RADIUS_TARGETS:
+            for target_id, distance in _worker_indices[table].within(lon, lat, PROXIMITY_RADIUS_KM):
+                found[(table, target_id)] = [None, distance]
+        for table in PROXIMITY_KNN_TARGETS:
+            ranked = _worker_indices[table].nearest(lon, lat, PROXIMITY_K)
+            for rank, (target_id, distance) in enumerate(ranked, start=1):
+                found[(table, target_id)] = [rank, distance]
+
+        for (table, target_id), (rank, distance) in found.items():
+            if table == source_table and target_id == source_id:
+                continue
+            edges.append((region, source_table, source_id, table, target_id, rank, round(distance, 4)))
+    return edges
+
+def load_points(cur, table_name, region, ids=None):
+    """Load (id, lon, lat) centroids for a table's region, optionally restricted to ids"""
+    query = f"""
+        SELECT id, centroid_lon, centroid_lat FROM {table_name}
+        WHERE region = %s AND centroid_lon IS NOT NULL
+    """
+    if ids is None:
+        cur.execute(query, (region,))
+    else:
+        cur.execute(query + " AND id = ANY(%s)", (region, list(ids)))
+    return [tuple(row) for row in cur.fetchall()]
+
+def build_proximity_graph(region=DEFAULT_REGION, source_ids=None, incremental=False, workers=None):
+    """Precompute a region's nearest-neighbour and within-radius edges into facility_proximity.
+
+    With no arguments every source facility is recomputed. source_ids restricts
+    the refresh to those facilities (e.g. after they were edited), and
+    incremental=True only computes sources that have no edges yet.
+    """
+    conn = psycopg2.connect(**DB_PARAMS)
+    cur = conn.cursor()
+
+    print(f"\nBuilding facility proximity graph ({region})...")
+
+    target_tables = sorted(set(PROXIMITY_KNN_TARGETS) | set(PROXIMITY_RADIUS_TARGETS))
+    target_points = {table: load_points(cur, table, region) for table in target_tables}
+
+    jobs = []
+    for source_table in PROXIMITY_SOURCES:
+        ids = source_ids
+        if ids is None and incremental:
+            cur.execute(f"""
+                SELECT s.id FROM {source_table} s
+                WHERE s.region = %s AND NOT EXISTS (
+                    SELECT 1 FROM facility_proximity p
+                    WHERE p.region = s.region AND p.source_table = %s AND p.source_id = s.id
+                )
+            """, (region, source_table))
+            ids = [row[0] for row in cur.fetchall()]
+
+        if ids is None:
+            cur.execute("DELETE FROM facility_proximity WHERE region = %s AND source_table = %s",
+                        (region, source_table))
+        else:
+            cur.execute(
+                "DELETE FROM facility_proximity WHERE region = %s AND source_table = %s AND source_id = ANY(%s)",
+                (region, source_table, list(ids))
+            )
+
+        sources = load_points(cur, source_table, region, ids)
+        for start in range(0, len(sources), PROXIMITY_CHUNK_SIZE):
+            jobs.append((region, source_table, sources[start:start + PROXIMITY_CHUNK_SIZE]))
+
+    inserted = 0
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_proximity_worker,
+                                 initargs=(target_points,)) as pool:
+            for edges in pool.map(_proximity_edges, jobs):
+                psycopg2.extras.execute_values(cur, """
+                    INSERT INTO facility_proximity
+                        (region, source_table, source_id, target_table, target_id, rank, distance_km)
+                    VALUES %s
+                    ON CONFLICT DO NOTHING
+                """, edges, page_size=1000)
+                inserted += len(edges)
+
+    conn.commit()
+    cur.close()
+    conn.close()
+
+    print(f"✓ Stored {inserted} proximity edges")
+
+def affected_proximity_sources(cur, region, changed_ids):
+    """Source facilities whose edges may change after the given facilities were added, edited or removed.
+
+    That is: changed facilities that are sources themselves, sources with an
+    existing edge to a changed facility (covers removals and moves), and
+    sources that a changed target's current location could now reach, either
+    within PROXIMITY_RADIUS_KM or closer than their current k-th neighbour.
+    """
+    changed_ids = list(changed_ids)
+    affected = set()
+
+    for source_table in PROXIMITY_SOURCES:
+        cur.execute(f"SELECT id FROM {source_table} WHERE region = %s AND id = ANY(%s)", (region, changed_ids))
+        affected.update(row[0] for row in cur.fetchall())
+
+    cur.execute("""
+        SELECT DISTINCT source_id FROM facility_proximity
+        WHERE region = %s AND target_id = ANY(%s)
+    """, (region, changed_ids))
+    affected.update(row[0] for row in cur.fetchall())
+
+    target_tables = sorted(set(PROXIMITY_KNN_TARGETS) | set(PROXIMITY_RADIUS_TARGETS))
+    changed_targets = []
+    for table in target_tables:
+        changed_targets.extend((table, lon, lat) for _, lon, lat in load_points(cur, table, region, changed_ids))
+    if not changed_targets:
+        return affected
+
+    # Distance to each source's current k-th nearest neighbour per target table
+    cur.execute("""
+        SELECT source_id, target_table, MAX(distance_km), COUNT(*)
+        FROM facility_proximity
+        WHERE region = %s AND rank IS NOT NULL
+        GROUP BY source_id, target_table
+    """, (region,))
+    kth_distance = {}
+    for source_id, table, max_distance, count in cur.fetchall():
+        kth_distance[(source_id, table)] = max_distance if count >= PROXIMITY_K else math.inf
+
+    for source_table in PROXIMITY_SOURCES:
+        for source_id, lon, lat in load_points(cur, source_table, region):
+            if source_id in affected:
+                continue
+            for table, target_lon, target_lat in changed_targets:
+                reach = PROXIMITY_RADIUS_KM if table in PROXIMITY_RADIUS_TARGETS else 0.0
+                if table in PROXIMITY_KNN_TARGETS:
+                    reach = max(reach, kth_distance.get((source_id, table), math.inf))
+                if haversine_km(lon, lat, target_lon, target_lat) <= reach:
+                    affected.add(source_id)
+                    break
+
+    return affected
+
+def refresh_proximity(region=DEFAULT_REGION, changed_ids=None):
+    """Incrementally refresh proximity edges after facilities were added, edited or removed.
+
+    Edges of changed sources are always deleted first, which is what removes a
+    deleted source from the graph. With no changed_ids, only sources that have
+    no edges yet are computed.
+    """
+    if not changed_ids:
+        build_proximity_graph(region=region, incremental=True)
+        mark_region_loaded(region)
+        return
+
+    conn = psycopg2.connect(**DB_PARAMS)
+    cur = conn.cursor()
+
+    # Changed sources lose their edges whether or not they still exist, so removed
+    # sources don't linger; those still present are recomputed below.
+    removed = 0
+    for source_table in PROXIMITY_SOURCES:
+        cur.execute(
+            "DELETE FROM facility_proximity WHERE region = %s AND source_table = %s AND source_id = ANY(%s)",
+            (region, source_table, list(changed_ids))
+        )
+        removed += cur.rowcount
+    conn.commit()
+
+    affected = affected_proximity_sources(cur, region, changed_ids)
+    cur.close()
+    conn.close()
+
+    print(f"\nDeleted {removed} edges of changed source facilities")
+    print(f"{len(affected)} source facilities affected by {len(changed_ids)} changed id(s)")
+    if affected:
+        build_proximity_graph(region=region, source_ids=sorted(affected))
+    mark_region_loaded(region)
+
+def build_aggregates(region=DEFAULT_REGION):
+    """Bin each layer's features into square grid cells at every resolution"""
+    conn = psycopg2.connect(**DB_PARAMS)
+    cur = conn.cursor()
+
+    print(f"\nBuilding grid aggregates ({region})...")
+
+    cur.execute("DELETE FROM layer_aggregates WHERE region = %s", (region,))
+
+    stored = 0
+    for layer, has_building_attrs in AGGREGATE_LAYERS.items():
+        if has_building_attrs:
+            attrs = "SUM(height), COUNT(height), SUM(num_floors), COUNT(num_floors)"
+        else:
+            attrs = "NULL, NULL, NULL, NULL"
+
+        for resolution, cell_deg in enumerate(AGGREGATE_CELL_DEGREES):
+            # Binned straight from the stored centroid columns
+            cur.execute(f"""
+                INSERT INTO layer_aggregates
+                    (region, layer, resolution, cell_x, cell_y, count,
+                     sum_height, height_count, sum_floors, floors_count)
+                SELECT region, %s, %s,
+                       FLOOR(centroid_lon / %s)::INTEGER AS cell_x,
+                       FLOOR(centroid_lat / %s)::INTEGER AS cell_y,
+                       COUNT(*), {attrs}
+                FROM {layer}
+                WHERE region = %s AND centroid_lon IS NOT NULL
+                GROUP BY region, cell_x, cell_y
+            """, (layer, resolution, cell_deg, cell_deg, region))
+            stored += cur.rowcount
+
+    conn.commit()
+    cur.close()
+    conn.close()
+
+    print(f"✓ Stored {stored} aggregate cells")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Set up the database and load infrastructure data")
+    parser.add_argument("--region", choices=sorted(REGIONS),
+                        help="Reload only this region, leaving the schema and other regions untouched")
+    parser.add_argument("--refresh-proximity", nargs="*", metavar="ID",
+                        help="Only refresh proximity edges (of --region, default %s) affected by these "
+                             "added/edited/removed facility ids; with no ids, fill in sources missing edges"
+                             % DEFAULT_REGION)
+    args = parser.parse_args()
+
+    if args.refresh_proximity is not None:
+        refresh_proximity(region=args.region or DEFAULT_REGION, changed_ids=args.refresh_proximity)
+    elif args.region:
+        load_region(args.region)
+    else:
+        # Setup database
+        setup_database()
+
+        for region in REGIONS:
+            load_region(region)
+
+    if args.refresh_proximity is None:
+        print("\n✓ All data loaded successfully!")